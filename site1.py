@@ -1,40 +1,140 @@
-import os
-import time
-import requests
-import shutil
+import asyncio
+import io
+import logging
+import logging.handlers
+import sys
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
+from aiohttp_retry import ExponentialRetry, RetryClient
+import soupsieve as sv
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
+log = logging.getLogger("site1")
 
 BASE_URL = "https://www.westonaprice.org"
 MAIN_PAGE = "https://www.westonaprice.org/health-topics/"
-BASE_FOLDER = "articles_for_site1"
 ZIP_NAME = "articles_for_site1"
+MAX_CONCURRENCY = 10  # articles fetched in parallel
+MIN_CONTENT = 300  # shorter articles are treated as stubs / member-only
+REQUEST_DELAY = 1.5  # polite delay between requests to the same host
+
+# Listing-page selectors, compiled once
+CATEGORY_SEL = sv.compile("a[href*='health-topics-category']")
+ARTICLE_SEL = sv.compile("main.content h5 a")
 
 headers = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Accept": "text/html",
+    "Accept-Encoding": "gzip, br",  # br needs the Brotli package
+    "Connection": "keep-alive",
 }
 
-os.makedirs(BASE_FOLDER, exist_ok=True)
+seen_articles = set()  # article URLs already scraped, across categories
 
 
 # =========================
 # SAFE REQUEST HELPER
 # =========================
-def fetch_url(url, headers, retries=3, timeout=30):
-    for attempt in range(1, retries + 1):
+# Exponential backoff that honours the server's Retry-After (in seconds)
+class PoliteRetry(ExponentialRetry):
+    def get_timeout(self, attempt, response=None):
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return super().get_timeout(attempt, response)
+
+
+RETRY_OPTIONS = PoliteRetry(
+    attempts=3,
+    start_timeout=1.5,
+    statuses={429, 500, 502, 503, 504},
+    retry_all_server_errors=False,
+    exceptions={aiohttp.ClientError, asyncio.TimeoutError},
+)
+
+
+class DomainLimiter:
+    def __init__(self, delay):
+        self.delay = delay
+        self.last = {}
+        self.locks = {}
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        if host not in self.locks:
+            self.locks[host] = asyncio.Lock()
+
+        async with self.locks[host]:
+            loop = asyncio.get_running_loop()
+            wait = self.last.get(host, float("-inf")) + self.delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last[host] = loop.time()
+
+
+limiter = DomainLimiter(REQUEST_DELAY)
+
+
+ROBOTS = {}  # host → parsed robots.txt
+
+
+async def allowed(session, url):
+    parsed = urlparse(url)
+    rp = ROBOTS.get(parsed.netloc)
+
+    if rp is None:
+        rp = RobotFileParser(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+        await limiter.wait(rp.url)
         try:
-            response = requests.get(url, headers=headers, timeout=timeout)
+            async with session.get(
+                rp.url, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status in (401, 403):
+                    rp.disallow_all = True
+                elif response.status >= 400:
+                    rp.allow_all = True
+                else:
+                    rp.parse((await response.text()).splitlines())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            rp.allow_all = True
+        ROBOTS[parsed.netloc] = rp
+
+    return rp.can_fetch(headers["User-Agent"], url)
+
+
+# session is a RetryClient: retries with backoff happen inside get()
+async def fetch_url(session, url, timeout=30):
+    if not await allowed(session, url):
+        log.warning(f"🚫 Disallowed by robots.txt → {url}")
+        return None
+
+    await limiter.wait(url)
+    try:
+        async with session.get(
+            url, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
             response.raise_for_status()
-            return response
-        except requests.exceptions.ReadTimeout:
-            print(f"⏳ Timeout (attempt {attempt}/{retries}) → {url}")
-        except requests.exceptions.ConnectionError as e:
-            print(f"🌐 Connection error (attempt {attempt}/{retries}) → {e}")
-        except requests.exceptions.HTTPError as e:
-            print(f"❌ HTTP error → {e}")
-            break
-        time.sleep(3)
-
-    print(f"❌ Skipping after {retries} failed attempts → {url}")
+            return await response.read()
+    except asyncio.TimeoutError:
+        log.warning(f"⏳ Timeout → {url}")
+    except aiohttp.ClientResponseError as e:
+        log.warning(f"❌ HTTP error → {e}")
+    except aiohttp.ClientError as e:
+        log.warning(f"🌐 Connection error → {e}")
+
+    log.warning(f"❌ Skipping after {RETRY_OPTIONS.attempts} failed attempts → {url}")
     return None
 
 
@@ -42,236 +142,327 @@ def slug_from_url(url: str) -> str:
     return url.rstrip("/").split("/")[-1]
 
 
+def get_text(el: LexborNode, separator: str = "") -> str:
+    return el.text(separator=separator, strip=True, skip_empty=True)
+
+
 # =========================
 # HTML → MARKDOWN
 # =========================
-def html_to_markdown(content_div: BeautifulSoup) -> str:
-    md = []
-
-    allowed_tags = [
-        "h1", "h2", "h3", "h4", "h5",
-        "p", "br", "hr",
-        "strong", "em", "b", "i",
-        "ul", "ol", "li",
-        "blockquote",
-        "dl", "dt", "dd",
-        "table", "thead", "tbody", "tfoot", "tr", "th", "td",
-        "figure", "figcaption", "img",
-        "pre", "code",
-        "a"
-    ]
-
-    for el in content_div.find_all(allowed_tags, recursive=True):
-
-        # ---------- HEADINGS ----------
-        if el.name in ["h1", "h2", "h3", "h4", "h5"]:
-            text = el.get_text(strip=True)
-            if text:
-                level = {
-                    "h1": "#",
-                    "h2": "##",
-                    "h3": "###",
-                    "h4": "####",
-                    "h5": "#####"
-                }[el.name]
-                md.append(f"{level} {text}\n")
-
-        # ---------- PARAGRAPH ----------
-        elif el.name == "p":
-            text = el.get_text(" ", strip=True)
-            if text and text != "\xa0":
-                md.append(f"{text}\n")
-
-        # ---------- LINE BREAK ----------
-        elif el.name == "br":
-            md.append("")
-
-        # ---------- HR ----------
-        elif el.name == "hr":
-            md.append("\n---\n")
-
-        # ---------- LISTS ----------
-        elif el.name in ["ul", "ol"]:
-            for li in el.find_all("li", recursive=False):
-                li_text = li.get_text(" ", strip=True)
-                if li_text:
-                    md.append(f"- {li_text}")
-            md.append("")
-
-        # ---------- BLOCKQUOTE ----------
-        elif el.name == "blockquote":
-            text = el.get_text(" ", strip=True)
-            if text:
-                md.append(f"> {text}\n")
-
-        # ---------- DEFINITIONS ----------
-        elif el.name == "dt":
-            text = el.get_text(strip=True)
-            if text:
-                md.append(f"**{text}**")
-        elif el.name == "dd":
-            text = el.get_text(" ", strip=True)
-            if text:
-                md.append(f": {text}\n")
-
-        # ---------- TABLE ----------
-        elif el.name == "table":
-            md.append("")
-            for row in el.find_all("tr"):
-                cells = row.find_all(["td", "th"])
-                if len(cells) >= 2:
-                    left = cells[0].get_text(" ", strip=True)
-                    right = cells[1].get_text(" ", strip=True)
-                    if left and right:
-                        md.append(f"- **{left}** {right}")
-            md.append("")
-
-        # ---------- FIGURE ----------
-        elif el.name == "figure":
-            img = el.find("img")
-            caption = el.find("figcaption")
-
-            if img and img.get("src"):
-                alt = img.get("alt", "").strip()
-                md.append(f"![{alt}]({img['src']})")
-
-            if caption:
-                cap_text = caption.get_text(" ", strip=True)
-                if cap_text:
-                    md.append(f"*{cap_text}*\n")
-
-        # ---------- IMAGE ----------
-        elif el.name == "img" and el.parent.name != "figure":
-            src = el.get("src")
-            alt = el.get("alt", "")
-            if src:
-                md.append(f"![{alt}]({src})\n")
-
-        # ---------- CODE ----------
-        elif el.name == "pre":
-            code = el.get_text()
-            if code.strip():
-                md.append(f"```\n{code}\n```\n")
-
-        elif el.name == "code":
-            text = el.get_text(strip=True)
-            if text:
-                md.append(f"`{text}`")
-
-        # ---------- LINKS ----------
-        elif el.name == "a":
-            href = el.get("href")
-            text = el.get_text(strip=True)
-            if href and text:
-                md.append(f"[{text}]({href})")
-
-    return "\n".join(md).strip()
+HEADING_LEVEL = {
+    "h1": "#",
+    "h2": "##",
+    "h3": "###",
+    "h4": "####",
+    "h5": "#####"
+}
 
 
-# =========================
-# ARTICLE SCRAPER
-# =========================
-def scrape_article(article_url: str, category_folder: str):
-    response = fetch_url(article_url, headers)
-    if response is None:
-        return
+# ---------- HEADINGS ----------
+def _heading(el, buf):
+    text = get_text(el)
+    if text:
+        buf.write(f"{HEADING_LEVEL[el.tag]} {text}\n\n")
 
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    title_tag = soup.find("h1")
-    content_div = soup.select_one("div.entry-content")
+# ---------- PARAGRAPH ----------
+def _paragraph(el, buf):
+    text = get_text(el, " ")
+    if text and text != "\xa0":
+        buf.write(f"{text}\n\n")
 
-    if not title_tag or not content_div:
-        print(f"⚠️ Missing content → {article_url}")
-        return
 
-    title = title_tag.get_text(strip=True)
-    slug = slug_from_url(article_url)
-    file_path = os.path.join(category_folder, f"{slug}.md")
+# ---------- LINE BREAK ----------
+def _line_break(el, buf):
+    buf.write("\n")
 
-    markdown_body = html_to_markdown(content_div)
 
-    if len(markdown_body) < 300:
-        print(f"⚠️ Low content → {article_url}")
-        return
+# ---------- HR ----------
+def _hr(el, buf):
+    buf.write("\n---\n\n")
 
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"# {title}\n\n")
-        f.write(f"Source: {article_url}\n\n")
-        f.write(markdown_body)
 
-    print(f"   ✔ Saved: {slug}.md")
+# ---------- LISTS ----------
+def _list(el, buf):
+    for li in el.iter():
+        if li.tag != "li":
+            continue
+        li_text = get_text(li, " ")
+        if li_text:
+            buf.write(f"- {li_text}\n")
+    buf.write("\n")
 
 
-# =========================
-# CATEGORY SCRAPER
-# =========================
-def scrape_category(name: str, url: str):
-    category_slug = slug_from_url(url)
-    category_folder = os.path.join(BASE_FOLDER, category_slug)
-    os.makedirs(category_folder, exist_ok=True)
+# ---------- BLOCKQUOTE ----------
+def _blockquote(el, buf):
+    text = get_text(el, " ")
+    if text:
+        buf.write(f"> {text}\n\n")
 
-    print(f"\n📂 Category: {name}")
-    print(f"Folder: {category_folder}")
 
-    response = fetch_url(url, headers)
-    if response is None:
-        return
+# ---------- DEFINITIONS ----------
+def _term(el, buf):
+    text = get_text(el)
+    if text:
+        buf.write(f"**{text}**\n")
 
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    article_links = soup.select("main.content h5 a")
-    print(f"Found {len(article_links)} articles")
+def _definition(el, buf):
+    text = get_text(el, " ")
+    if text:
+        buf.write(f": {text}\n\n")
+
+
+# ---------- TABLE ----------
+def _table(el, buf):
+    buf.write("\n")
+    for row in el.css("tr"):
+        cells = row.css("td, th")
+        if len(cells) >= 2:
+            left = get_text(cells[0], " ")
+            right = get_text(cells[1], " ")
+            if left and right:
+                buf.write(f"- **{left}** {right}\n")
+    buf.write("\n")
+
+
+# ---------- FIGURE ----------
+def _figure(el, buf):
+    img = el.css_first("img")
+    caption = el.css_first("figcaption")
+
+    if img and img.attributes.get("src"):
+        alt = (img.attributes.get("alt") or "").strip()
+        buf.write(f"![{alt}]({img.attributes['src']})\n")
+
+    if caption:
+        cap_text = get_text(caption, " ")
+        if cap_text:
+            buf.write(f"*{cap_text}*\n\n")
+
+
+# ---------- IMAGE ----------
+def _image(el, buf):
+    src = el.attributes.get("src")
+    alt = el.attributes.get("alt") or ""
+    if src:
+        buf.write(f"![{alt}]({src})\n\n")
 
-    for link in article_links:
-        article_url = link.get("href")
-        if article_url:
-            scrape_article(article_url, category_folder)
-            time.sleep(1)  # polite delay
+
+# ---------- CODE ----------
+def _pre(el, buf):
+    code = el.text()
+    if code.strip():
+        buf.write(f"```\n{code}\n```\n\n")
+
+
+def _code(el, buf):
+    text = get_text(el)
+    if text:
+        buf.write(f"`{text}`\n")
+
+
+# ---------- LINKS ----------
+def _link(el, buf):
+    href = el.attributes.get("href")
+    text = get_text(el)
+    if href and text:
+        buf.write(f"[{text}]({href})\n")
+
+
+# Tag name → handler; tags without a handler are skipped
+HANDLERS = {
+    "h1": _heading, "h2": _heading, "h3": _heading,
+    "h4": _heading, "h5": _heading,
+    "p": _paragraph,
+    "br": _line_break,
+    "hr": _hr,
+    "ul": _list, "ol": _list,
+    "blockquote": _blockquote,
+    "dt": _term, "dd": _definition,
+    "table": _table,
+    "figure": _figure,
+    "img": _image,
+    "pre": _pre,
+    "code": _code,
+    "a": _link,
+}
+
+# Tags whose handler renders their whole subtree
+CONTAINERS = frozenset(("ul", "ol", "table", "figure"))
+
+
+def html_to_markdown(content_div: LexborNode) -> str:
+    buf = io.StringIO()
+
+    # Depth-first walk; containers are rendered whole by their handler,
+    # so their subtree is not visited again.
+    stack = [content_div]
+    while stack:
+        el = stack.pop()
+        handler = HANDLERS.get(el.tag)
+        if handler:
+            handler(el, buf)
+        if el.tag not in CONTAINERS:
+            stack.extend(reversed(list(el.iter())))
+
+    return buf.getvalue().strip()
 
 
 # =========================
 # ZIP
 # =========================
-def zip_results():
-    if os.path.exists(f"{ZIP_NAME}.zip"):
-        os.remove(f"{ZIP_NAME}.zip")
+zip_lock = threading.Lock()
 
-    shutil.make_archive(ZIP_NAME, "zip", BASE_FOLDER)
-    print(f"\n📦 ZIP created: {ZIP_NAME}.zip")
+
+# Runs in a worker thread; ZipFile can't take concurrent writers
+def write_entry(zf, arcname, text):
+    with zip_lock:
+        zf.writestr(arcname, text)
 
 
 # =========================
-# MAIN
+# ARTICLE SCRAPER
+# =========================
+# Runs in a worker process: returns (title, markdown), or None when the
+# page has no title/body. Stub pages come back with an empty body.
+def render_article(html: bytes):
+    tree = LexborHTMLParser(html)
+
+    title_tag = tree.css_first("h1")
+    content_div = tree.css_first("div.entry-content")
+
+    if not title_tag or not content_div:
+        return None
+
+    title = get_text(title_tag)
+
+    # Cheap text-length check before the full conversion
+    if len(get_text(content_div, " ")) < MIN_CONTENT:
+        return title, ""
+
+    return title, html_to_markdown(content_div)
+
+
+async def scrape_article(
+    session, sem, pool, zf, article_url: str, category_slug: str
+):
+    async with sem:
+        html = await fetch_url(session, article_url)
+    if html is None:
+        return
+
+    loop = asyncio.get_running_loop()
+    article = await loop.run_in_executor(pool, render_article, html)
+
+    if article is None:
+        log.warning(f"⚠️ Missing content → {article_url}")
+        return
+
+    title, markdown_body = article
+    slug = slug_from_url(article_url)
+
+    if len(markdown_body) < MIN_CONTENT:
+        log.warning(f"⚠️ Low content → {article_url}")
+        return
+
+    await asyncio.to_thread(
+        write_entry,
+        zf,
+        f"{category_slug}/{slug}.md",
+        f"# {title}\n\nSource: {article_url}\n\n{markdown_body}",
+    )
+
+    log.info(f"   ✔ Saved: {slug}.md")
+
+
+# =========================
+# CATEGORY SCRAPER
 # =========================
-def main():
-    print("🔎 Fetching Health Topic categories...\n")
+async def scrape_category(session, sem, pool, zf, name: str, url: str):
+    category_slug = slug_from_url(url)
+
+    log.info(f"📂 Category: {name}")
+    log.info(f"Folder: {category_slug}/")
 
-    response = fetch_url(MAIN_PAGE, headers)
-    if response is None:
+    html = await fetch_url(session, url)
+    if html is None:
         return
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    soup = BeautifulSoup(html, "lxml")
 
-    categories = soup.select("a[href*='health-topics-category']")
-    seen = set()
-    unique_categories = []
+    article_links = ARTICLE_SEL.select(soup)
+    log.info(f"Found {len(article_links)} articles")
 
-    for cat in categories:
-        name = cat.get_text(strip=True)
-        url = cat.get("href")
-        if url and url not in seen:
-            seen.add(url)
-            unique_categories.append((name, url))
+    article_urls = []
+    for link in article_links:
+        article_url = link.get("href")
+        if not article_url or article_url in seen_articles:
+            continue
+        seen_articles.add(article_url)
+        article_urls.append(article_url)
 
-    print(f"Total categories found: {len(unique_categories)}")
+    await asyncio.gather(*(
+        scrape_article(session, sem, pool, zf, article_url, category_slug)
+        for article_url in article_urls
+    ))
 
-    for name, url in unique_categories:
-        scrape_category(name, url)
 
-    zip_results()
-    print("\n✅ ALL categories scraped successfully")
+# =========================
+# MAIN
+# =========================
+async def main():
+    log.info("🔎 Fetching Health Topic categories...")
+
+    connector = aiohttp.TCPConnector(
+        limit=20, limit_per_host=4, keepalive_timeout=60
+    )
+    async with RetryClient(
+        retry_options=RETRY_OPTIONS, headers=headers, connector=connector
+    ) as session:
+        html = await fetch_url(session, MAIN_PAGE)
+        if html is None:
+            return
+
+        soup = BeautifulSoup(html, "lxml")
+
+        categories = CATEGORY_SEL.select(soup)
+        seen = set()
+        unique_categories = []
+
+        for cat in categories:
+            name = cat.get_text(strip=True)
+            url = cat.get("href")
+            if url and url not in seen:
+                seen.add(url)
+                unique_categories.append((name, url))
+
+        log.info(f"Total categories found: {len(unique_categories)}")
+
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        with ProcessPoolExecutor() as pool, zipfile.ZipFile(
+            f"{ZIP_NAME}.zip", "w", zipfile.ZIP_DEFLATED, compresslevel=6
+        ) as zf:
+            for name, url in unique_categories:
+                await scrape_category(session, sem, pool, zf, name, url)
+
+    log.info(f"📦 ZIP created: {ZIP_NAME}.zip")
+    log.info("✅ ALL categories scraped successfully")
+
+
+# INFO messages are written in batches; warnings (and exit) flush at once
+def setup_logging():
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    buffered = logging.handlers.MemoryHandler(
+        capacity=100, flushLevel=logging.WARNING, target=stream
+    )
+    logging.basicConfig(level=logging.INFO, handlers=[buffered])
 
 
 if __name__ == "__main__":
-    main()
+    setup_logging()
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
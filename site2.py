@@ -1,9 +1,25 @@
-import os
-import time
-import requests
-import shutil
+import asyncio
+import io
+import logging
+import logging.handlers
+import sys
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+import aiohttp
+from aiohttp_retry import ExponentialRetry, RetryClient
+import soupsieve as sv
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser, LexborNode
 from urllib.parse import urljoin, urlparse, parse_qs
+from urllib.robotparser import RobotFileParser
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
+
+log = logging.getLogger("site2")
 
 # ============================================================
 # CONFIG
@@ -12,37 +28,129 @@ from urllib.parse import urljoin, urlparse, parse_qs
 BASE_URL = "https://www.greenmedinfo.com"
 START_PAGE = "https://www.greenmedinfo.com/gmi-blogs-popular"
 
-OUTPUT_FOLDER = "articles_for_site2"
 ZIP_NAME = "articles_for_site2"
 
 HEADERS = {
-    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+    "Accept": "text/html",
+    "Accept-Encoding": "gzip, br",  # br needs the Brotli package
+    "Connection": "keep-alive",
 }
 
-REQUEST_DELAY = 1  # polite delay between requests
+REQUEST_DELAY = 1.5  # polite delay between requests to the same host
+MAX_CONCURRENCY = 10  # articles fetched in parallel
+MIN_CONTENT = 300  # shorter articles are treated as stubs / member-only
 
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+# Listing-page selectors, compiled once
+PAGER_LAST_SEL = sv.compile("li.pager-last a")
+ARTICLE_SEL = sv.compile("div.views-field-title a")
 
 
 # ============================================================
 # SAFE REQUEST HELPER
 # ============================================================
 
-def fetch_url(url, retries=3, timeout=30):
+class PoliteRetry(ExponentialRetry):
+    """
+    Exponential backoff that waits for the server's Retry-After
+    (in seconds) when one is sent, e.g. on 429 / 503.
+    """
+
+    def get_timeout(self, attempt, response=None):
+        retry_after = (
+            response.headers.get("Retry-After") if response is not None else None
+        )
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return super().get_timeout(attempt, response)
+
+
+RETRY_OPTIONS = PoliteRetry(
+    attempts=3,
+    start_timeout=1.5,
+    statuses={429, 500, 502, 503, 504},
+    retry_all_server_errors=False,
+    exceptions={aiohttp.ClientError, asyncio.TimeoutError},
+)
+
+
+class DomainLimiter:
+    """
+    Space out requests to the same host by at least `delay` seconds,
+    while letting requests to different hosts run freely.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.last = {}
+        self.locks = {}
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        if host not in self.locks:
+            self.locks[host] = asyncio.Lock()
+
+        async with self.locks[host]:
+            loop = asyncio.get_running_loop()
+            wait = self.last.get(host, float("-inf")) + self.delay - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.last[host] = loop.time()
+
+
+limiter = DomainLimiter(REQUEST_DELAY)
+
+
+ROBOTS = {}  # host → parsed robots.txt
+
+
+async def allowed(session, url):
     """
-    Safely fetch a URL with retries.
+    Check robots.txt for the URL's host, fetching it once per host.
     """
-    for attempt in range(1, retries + 1):
+    parsed = urlparse(url)
+    rp = ROBOTS.get(parsed.netloc)
+
+    if rp is None:
+        rp = RobotFileParser(f"{parsed.scheme}://{parsed.netloc}/robots.txt")
+        await limiter.wait(rp.url)
         try:
-            response = requests.get(url, headers=HEADERS, timeout=timeout)
+            async with session.get(
+                rp.url, timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                if response.status in (401, 403):
+                    rp.disallow_all = True
+                elif response.status >= 400:
+                    rp.allow_all = True
+                else:
+                    rp.parse((await response.text()).splitlines())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            rp.allow_all = True
+        ROBOTS[parsed.netloc] = rp
+
+    return rp.can_fetch(HEADERS["User-Agent"], url)
+
+
+async def fetch_url(session, url, timeout=30):
+    """
+    Safely fetch a URL and return the raw body bytes. `session` is a
+    RetryClient, so retries with backoff happen inside get().
+    """
+    if not await allowed(session, url):
+        log.warning(f"🚫 Disallowed by robots.txt → {url}")
+        return None
+
+    await limiter.wait(url)
+    try:
+        async with session.get(
+            url, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
             response.raise_for_status()
-            return response
-        except requests.exceptions.RequestException as e:
-            print(f"⏳ Retry {attempt}/{retries} → {url}")
-            print(f"   Error: {e}")
-            time.sleep(3)
+            return await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        log.warning(f"   Error: {e}")
 
-    print(f"❌ Failed permanently → {url}")
+    log.warning(f"❌ Failed permanently → {url}")
     return None
 
 
@@ -53,151 +161,215 @@ def slug_from_url(url: str) -> str:
     return url.rstrip("/").split("/")[-1]
 
 
+def get_text(el: LexborNode, separator: str = "") -> str:
+    """
+    Stripped text of a node, equivalent to BeautifulSoup's get_text(strip=True).
+    """
+    return el.text(separator=separator, strip=True, skip_empty=True)
+
+
 # ============================================================
 # HTML → MARKDOWN CONVERTER
 # ============================================================
 
-def html_to_markdown(content_div: BeautifulSoup) -> str:
+HEADING_LEVEL = {
+    "h1": "#",
+    "h2": "##",
+    "h3": "###",
+    "h4": "####",
+    "h5": "#####",
+    "h6": "######",
+}
+
+
+# ---------------- HEADINGS ----------------
+def _heading(el, buf):
+    text = get_text(el)
+    if text:
+        buf.write(f"{HEADING_LEVEL[el.tag]} {text}\n\n")
+
+
+# ---------------- PARAGRAPHS ----------------
+def _paragraph(el, buf):
+    text = get_text(el, " ")
+    if text and text != "\xa0":
+        buf.write(f"{text}\n\n")
+
+
+# ---------------- LISTS ----------------
+def _list(el, buf):
+    for li in el.iter():
+        if li.tag != "li":
+            continue
+        text = get_text(li, " ")
+        if text:
+            buf.write(f"- {text}\n")
+    buf.write("\n")
+
+
+# ---------------- BLOCKQUOTE ----------------
+def _blockquote(el, buf):
+    text = get_text(el, " ")
+    if text:
+        buf.write(f"> {text}\n\n")
+
+
+# ---------------- TABLE ----------------
+def _table(el, buf):
+    buf.write("\n")
+    for row in el.css("tr"):
+        cells = row.css("th, td")
+        if len(cells) >= 2:
+            left = get_text(cells[0], " ")
+            right = get_text(cells[1], " ")
+            if left and right:
+                buf.write(f"- **{left}** {right}\n")
+    buf.write("\n")
+
+
+# ---------------- IMAGE ----------------
+def _image(el, buf):
+    src = el.attributes.get("src")
+    alt = el.attributes.get("alt") or ""
+    if src:
+        buf.write(f"![{alt}]({urljoin(BASE_URL, src)})\n\n")
+
+
+# ---------------- CODE ----------------
+def _pre(el, buf):
+    code = el.text()
+    if code.strip():
+        buf.write(f"```\n{code}\n```\n\n")
+
+
+def _code(el, buf):
+    text = get_text(el)
+    if text:
+        buf.write(f"`{text}`\n")
+
+
+# ---------------- LINKS (SAFE) ----------------
+def _link(el, buf):
+    href = el.attributes.get("href")
+    text = get_text(el)
+
+    if not href or not text:
+        return
+
+    try:
+        full_url = urljoin(BASE_URL, href)
+        buf.write(f"[{text}]({full_url})\n")
+    except ValueError:
+        # Handles invalid IPv6, javascript:, mailto:, malformed hrefs
+        buf.write(f"{text}\n")
+
+
+# Tag name → handler; tags without a handler are skipped
+HANDLERS = {
+    "h1": _heading, "h2": _heading, "h3": _heading,
+    "h4": _heading, "h5": _heading, "h6": _heading,
+    "p": _paragraph, "span": _paragraph,
+    "ul": _list, "ol": _list,
+    "blockquote": _blockquote,
+    "table": _table,
+    "img": _image,
+    "pre": _pre,
+    "code": _code,
+    "a": _link,
+}
+
+# Tags whose handler renders their whole subtree
+CONTAINERS = frozenset(("ul", "ol", "table"))
+
+
+def html_to_markdown(content_div: LexborNode) -> str:
     """
     Convert GreenMedInfo article HTML body to Markdown.
     """
-    md = []
-
-    allowed_tags = [
-        "h1", "h2", "h3", "h4", "h5", "h6",
-        "p", "span", "br", "hr",
-        "strong", "b", "em", "i", "u",
-        "ul", "ol", "li",
-        "blockquote",
-        "table", "thead", "tbody", "tr", "th", "td",
-        "img", "figure", "figcaption",
-        "pre", "code",
-        "a",
-        "div"
-    ]
-
-    for el in content_div.find_all(allowed_tags, recursive=True):
-
-        # ---------------- HEADINGS ----------------
-        if el.name in ["h1", "h2", "h3", "h4", "h5", "h6"]:
-            level = "#" * int(el.name[1])
-            text = el.get_text(strip=True)
-            if text:
-                md.append(f"{level} {text}\n")
-
-        # ---------------- PARAGRAPHS ----------------
-        elif el.name in ["p", "span"]:
-            text = el.get_text(" ", strip=True)
-            if text and text != "\xa0":
-                md.append(f"{text}\n")
-
-        # ---------------- LISTS ----------------
-        elif el.name in ["ul", "ol"]:
-            for li in el.find_all("li", recursive=False):
-                text = li.get_text(" ", strip=True)
-                if text:
-                    md.append(f"- {text}")
-            md.append("")
-
-        # ---------------- BLOCKQUOTE ----------------
-        elif el.name == "blockquote":
-            text = el.get_text(" ", strip=True)
-            if text:
-                md.append(f"> {text}\n")
-
-        # ---------------- TABLE ----------------
-        elif el.name == "table":
-            md.append("")
-            for row in el.find_all("tr"):
-                cells = row.find_all(["th", "td"])
-                if len(cells) >= 2:
-                    left = cells[0].get_text(" ", strip=True)
-                    right = cells[1].get_text(" ", strip=True)
-                    if left and right:
-                        md.append(f"- **{left}** {right}")
-            md.append("")
-
-        # ---------------- IMAGE ----------------
-        elif el.name == "img":
-            src = el.get("src")
-            alt = el.get("alt", "")
-            if src:
-                md.append(f"![{alt}]({urljoin(BASE_URL, src)})\n")
-
-        # ---------------- CODE ----------------
-        elif el.name == "pre":
-            code = el.get_text()
-            if code.strip():
-                md.append(f"```\n{code}\n```\n")
-
-        elif el.name == "code":
-            text = el.get_text(strip=True)
-            if text:
-                md.append(f"`{text}`")
-
-        # ---------------- LINKS (SAFE) ----------------
-        elif el.name == "a":
-            href = el.get("href")
-            text = el.get_text(strip=True)
-
-            if not href or not text:
-                continue
+    buf = io.StringIO()
 
-            try:
-                full_url = urljoin(BASE_URL, href)
-                md.append(f"[{text}]({full_url})")
-            except ValueError:
-                # Handles invalid IPv6, javascript:, mailto:, malformed hrefs
-                md.append(text)
+    # Depth-first walk; containers are rendered whole by their handler,
+    # so their subtree is not visited again.
+    stack = [content_div]
+    while stack:
+        el = stack.pop()
+        handler = HANDLERS.get(el.tag)
+        if handler:
+            handler(el, buf)
+        if el.tag not in CONTAINERS:
+            stack.extend(reversed(list(el.iter())))
 
-    return "\n".join(md).strip()
+    return buf.getvalue().strip()
 
 
 # ============================================================
 # ARTICLE SCRAPER
 # ============================================================
 
-def scrape_article(article_url: str):
+def render_article(html: bytes):
     """
-    Scrape a single GreenMedInfo article and save as Markdown.
+    Parse an article page into (title, markdown). Runs in a worker
+    process. Returns None when the title/body is missing, and an empty
+    body for member-only / stub pages.
+    """
+    tree = LexborHTMLParser(html)
+
+    title_tag = tree.css_first("div.field-title h1")
+    content_div = tree.css_first("div.field-body")
+
+    if not title_tag or not content_div:
+        return None
+
+    title = get_text(title_tag)
+
+    # Check the raw text length before paying for the full conversion
+    if len(get_text(content_div, " ")) < MIN_CONTENT:
+        return title, ""
+
+    return title, html_to_markdown(content_div)
+
+
+async def scrape_article(session, sem, pool, zf, article_url: str):
+    """
+    Scrape a single GreenMedInfo article and store it as Markdown in the ZIP.
     """
     slug = slug_from_url(article_url)
-    file_path = os.path.join(OUTPUT_FOLDER, f"{slug}.md")
+    arcname = f"{slug}.md"
 
     # ✅ Skip if article already exists
-    if os.path.exists(file_path):
-        print(f"   ⏭️ Skipped (already exists) → {slug}.md")
+    if in_zip(zf, arcname):
+        log.info(f"   ⏭️ Skipped (already exists) → {slug}.md")
         return
 
-    print(f"   🔍 Article → {article_url}")
+    log.info(f"   🔍 Article → {article_url}")
 
-    response = fetch_url(article_url)
-    if not response:
+    async with sem:
+        html = await fetch_url(session, article_url)
+    if not html:
         return
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    loop = asyncio.get_running_loop()
+    article = await loop.run_in_executor(pool, render_article, html)
 
-    title_tag = soup.select_one("div.field-title h1")
-    content_div = soup.select_one("div.field-body")
-
-    if not title_tag or not content_div:
-        print("   ⚠️ Skipped (missing title/body)")
+    if article is None:
+        log.warning(f"   ⚠️ Skipped (missing title/body) → {article_url}")
         return
 
-    title = title_tag.get_text(strip=True)
-    body_md = html_to_markdown(content_div)
+    title, body_md = article
 
     # Skip member-only / empty pages
-    if len(body_md) < 300:
-        print("   ⚠️ Skipped (low content / member-only)")
+    if len(body_md) < MIN_CONTENT:
+        log.warning(f"   ⚠️ Skipped (low content / member-only) → {article_url}")
         return
 
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(f"# {title}\n\n")
-        f.write(f"Source: {article_url}\n\n")
-        f.write(body_md)
+    await asyncio.to_thread(
+        write_entry,
+        zf,
+        arcname,
+        f"# {title}\n\nSource: {article_url}\n\n{body_md}",
+    )
 
-    print(f"   ✅ Saved → {slug}.md")
+    log.info(f"   ✅ Saved → {slug}.md")
 
 
 # ============================================================
@@ -208,7 +380,7 @@ def get_last_page(soup: BeautifulSoup) -> int:
     """
     Extract last pagination page number.
     """
-    last = soup.select_one("li.pager-last a")
+    last = PAGER_LAST_SEL.select_one(soup)
     if not last:
         return 0
 
@@ -220,36 +392,39 @@ def get_last_page(soup: BeautifulSoup) -> int:
 # MAIN SCRAPER (ALL PAGES)
 # ============================================================
 
-def scrape_all_pages():
+async def scrape_all_pages(session, pool, zf):
     """
     Scrape all paginated popular blog pages.
     """
-    print("🔎 Fetching first page...")
+    log.info("🔎 Fetching first page...")
 
-    first_response = fetch_url(START_PAGE)
-    if not first_response:
+    first_html = await fetch_url(session, START_PAGE)
+    if not first_html:
         return
 
-    soup = BeautifulSoup(first_response.text, "html.parser")
+    soup = BeautifulSoup(first_html, "lxml")
     last_page = get_last_page(soup)
 
-    print(f"📄 Total pages detected: {last_page + 1}\n")
+    log.info(f"📄 Total pages detected: {last_page + 1}")
 
     seen_articles = set()
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
 
     for page in range(0, last_page + 1):
         page_url = f"{START_PAGE}?page={page}"
-        print(f"\n📄 Page {page + 1}/{last_page + 1}")
-        print(f"   URL → {page_url}")
+        log.info(f"📄 Page {page + 1}/{last_page + 1}")
+        log.info(f"   URL → {page_url}")
 
-        response = fetch_url(page_url)
-        if not response:
+        html = await fetch_url(session, page_url)
+        if not html:
             continue
 
-        soup = BeautifulSoup(response.text, "html.parser")
+        soup = BeautifulSoup(html, "lxml")
+
+        article_links = ARTICLE_SEL.select(soup)
+        log.info(f"   🔗 Articles found: {len(article_links)}")
 
-        article_links = soup.select("div.views-field-title a")
-        print(f"   🔗 Articles found: {len(article_links)}")
+        page_articles = []
 
         for a in article_links:
             href = a.get("href")
@@ -262,37 +437,85 @@ def scrape_all_pages():
                 continue
 
             seen_articles.add(full_url)
-            scrape_article(full_url)
-            time.sleep(REQUEST_DELAY)
+            page_articles.append(full_url)
+
+        await asyncio.gather(*(
+            scrape_article(session, sem, pool, zf, url)
+            for url in page_articles
+        ))
 
 
 # ============================================================
 # ZIP RESULTS
 # ============================================================
 
-def zip_results():
+def open_zip() -> zipfile.ZipFile:
     """
-    Zip all scraped markdown files.
+    Open the results ZIP for appending, so articles saved by an
+    earlier run are kept and skipped.
     """
-    zip_path = f"{ZIP_NAME}.zip"
+    return zipfile.ZipFile(
+        f"{ZIP_NAME}.zip", "a", zipfile.ZIP_DEFLATED, compresslevel=6
+    )
 
-    if os.path.exists(zip_path):
-        os.remove(zip_path)
 
-    shutil.make_archive(ZIP_NAME, "zip", OUTPUT_FOLDER)
-    print(f"\n📦 ZIP created → {zip_path}")
+zip_lock = threading.Lock()
+
+
+def write_entry(zf: zipfile.ZipFile, arcname: str, text: str):
+    """
+    Store one article in the ZIP. Runs in a worker thread, so writes
+    are serialised: ZipFile can't take concurrent writers.
+    """
+    with zip_lock:
+        zf.writestr(arcname, text)
+
+
+def in_zip(zf: zipfile.ZipFile, arcname: str) -> bool:
+    """
+    Check whether an entry is already stored in the ZIP.
+    """
+    try:
+        zf.getinfo(arcname)
+    except KeyError:
+        return False
+    return True
 
 
 # ============================================================
 # ENTRY POINT
 # ============================================================
 
-def main():
-    print("\n🚀 GreenMedInfo Blog Scraper Started\n")
-    scrape_all_pages()
-    zip_results()
-    print("\n✅ ALL ARTICLES SCRAPED SUCCESSFULLY\n")
+async def main():
+    log.info("🚀 GreenMedInfo Blog Scraper Started")
+    connector = aiohttp.TCPConnector(
+        limit=20, limit_per_host=4, keepalive_timeout=60
+    )
+    async with RetryClient(
+        retry_options=RETRY_OPTIONS, headers=HEADERS, connector=connector
+    ) as session:
+        with ProcessPoolExecutor() as pool, open_zip() as zf:
+            await scrape_all_pages(session, pool, zf)
+    log.info(f"📦 ZIP created → {ZIP_NAME}.zip")
+    log.info("✅ ALL ARTICLES SCRAPED SUCCESSFULLY")
+
+
+def setup_logging():
+    """
+    Log to stderr through a MemoryHandler, so INFO messages are written
+    in batches; warnings (and exit) flush the buffer immediately.
+    """
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    buffered = logging.handlers.MemoryHandler(
+        capacity=100, flushLevel=logging.WARNING, target=stream
+    )
+    logging.basicConfig(level=logging.INFO, handlers=[buffered])
 
 
 if __name__ == "__main__":
-    main()
+    setup_logging()
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())